@@ -5,13 +5,20 @@ KeywordPDF Analyzer - Análise de documentos PDF com IA
 
 import os
 import sys
+import functools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from itertools import islice
 from pathlib import Path
 
 # Importações locais
-from src.pdf_processor import PDFProcessor
-from src.ai_analyzer import AIAnalyzer
-from src.csv_processor import CSVProcessor
+from src.pdf_processor import PDFProcessor, DOCLING_NUM_THREADS
+from src.ai_analyzer import AIAnalyzer, contains_keywords
+from src.csv_processor import CSVProcessor, BASE_COLUMNS
 from src.config_manager import ConfigManager
+from src.logger_manager import set_verbose
 
 # Rich (opcional) para uma saída mais amigável
 try:
@@ -32,6 +39,22 @@ except Exception:
     _RICH_UI = False
     _RICH_CONSOLE = None
 
+# Instância do processador reaproveitada dentro de cada processo worker
+_WORKER_PDF_PROCESSOR = None
+
+
+def _init_pdf_worker(num_threads=DOCLING_NUM_THREADS):
+    """Inicializa o processo worker: um PDFProcessor (e seus conversores) por processo"""
+    global _WORKER_PDF_PROCESSOR
+    _WORKER_PDF_PROCESSOR = PDFProcessor(num_threads=num_threads)
+
+
+def _convert_pdf_worker(pdf_path, verbose=False, backend="docling", cache_dir=None, prefilter=None):
+    """Converte um PDF em um processo worker do ProcessPoolExecutor (iniciado por _init_pdf_worker)"""
+    return _WORKER_PDF_PROCESSOR.convert_single_pdf_to_markdown(
+        pdf_path, verbose=verbose, backend=backend, cache_dir=cache_dir, prefilter=prefilter
+    )
+
 
 class KeywordAnalyzer:
     """Analisador principal de documentos PDF"""
@@ -48,17 +71,22 @@ class KeywordAnalyzer:
         print("=" * 50)
         
         # 1. Carrega configuração
-        config = self.config_manager.load_config()
+        config_file = self.config_manager.resolve_config_file()
+        config = self.config_manager.load_config(config_file)
+        # Mensagens de depuração (ex.: prévia das respostas da IA) só aparecem no modo verboso
+        set_verbose(config['verbose'])
         
         # Valida configuração
         if not self.config_manager.validate_config(config):
-            print("❌ Configuração inválida. Verifique o arquivo config.ini")
+            print(f"❌ Configuração inválida. Verifique o arquivo {config_file}")
             sys.exit(1)
         
         # Configura analisador de IA
         ai_provider = config.get('ai_provider', 'local')
         ai_model = config.get('ai_model', 'gemma3:latest')
         self.ai_analyzer.set_provider(ai_provider, ai_model)
+        self.ai_analyzer.skip_without_keywords = config['skip_without_keywords']
+        self.ai_analyzer.cache_dir = config['cache_dir'] or None
 
         # Verifica se IA está configurada
         if not self.ai_analyzer.is_configured():
@@ -76,6 +104,11 @@ class KeywordAnalyzer:
         print(f"   Modelo IA: {ai_model}")
         print(f"   Verbose: {config['verbose']}")
         print(f"   Manter markdown: {config['keep_markdown']}")
+        print(f"   Backend PDF: {config['pdf_backend']}")
+        print(f"   Cache: {config['cache_dir'] or 'desativado'}")
+        print(f"   Processos: {config['max_workers']}")
+        print(f"   Chamadas de IA simultâneas: {config['ai_workers']}")
+        print(f"   Pular documentos sem palavras-chave: {config['skip_without_keywords']}")
         print()
 
         # 2. Busca arquivos PDF
@@ -94,19 +127,21 @@ class KeywordAnalyzer:
         # output_path = os.path.join(config['output_path'], 'resultados.csv')
         
         # Carrega keywords
-        try:
-            with open(config['keywords_list'], 'r', encoding='utf-8') as f:
-                keywords = [line.strip() for line in f if line.strip() and not line.startswith('#')]
-        except Exception as e:
-            print(f"❌ Erro ao carregar keywords: {e}")
-            sys.exit(1)
+        keywords = self.config_manager.load_keywords(config['keywords_list'])
         
         if not keywords:
             print("❌ Nenhuma palavra-chave encontrada no arquivo")
             sys.exit(1)
         
+        self.ai_analyzer.set_keywords(keywords)
         processed_count = 0
 
+        # Com skip_without_keywords, PDFs cuja camada de texto não cita nenhuma palavra-chave
+        # dispensam a conversão completa (functools.partial é serializável para os workers)
+        prefilter = None
+        if config['skip_without_keywords']:
+            prefilter = functools.partial(contains_keywords, keywords=tuple(keywords))
+
         # if _RICH_UI and _RICH_CONSOLE is not None:
         progress = Progress(
             SpinnerColumn(style="cyan"),
@@ -123,55 +158,57 @@ class KeywordAnalyzer:
             console=_RICH_CONSOLE,
             transient=False,
         )
-        with progress:
+        fieldnames = BASE_COLUMNS + keywords
+        with progress, ExitStack() as open_files:
             task_id = progress.add_task("🔄 Processando PDFs...", total=len(pdf_files), stage="")
 
-            for i, pdf_filename in enumerate(pdf_files):
-                progress.update(task_id, description=f"📄 {os.path.basename(pdf_filename)}", stage="convertendo")
-                try:
-                    # Converte PDF para Markdown sob demanda
-                    pdf_path = os.path.join(pdf_filename)
-                    markdown_content = self.pdf_processor.convert_single_pdf_to_markdown(
-                        pdf_path,
-                        verbose=config['verbose']
+            # Um writer por arquivo resultados.csv, mantido aberto durante todo o lote
+            writers = {}
+
+            def save_row(row_data, output_path):
+                writer = writers.get(output_path)
+                if writer is None:
+                    writer = open_files.enter_context(
+                        self.csv_processor.open_writer(output_path, fieldnames, config['verbose'])
                     )
+                    writers[output_path] = writer
+                writer.writerow(row_data)
+                if config['verbose']:
+                    print(f"  💾 Resultado salvo: {row_data.get('filename', 'N/A')}")
+
+            def on_convert(pdf_filename):
+                progress.update(task_id, description=f"📄 {os.path.basename(pdf_filename)}", stage="convertendo")
 
+            def converted_documents():
+                for pdf_filename, markdown_content in self._iter_markdown(pdf_files, config, on_convert, prefilter):
                     if not markdown_content:
                         print(f"  ❌ Erro na conversão de {pdf_filename}")
-                        progress.update(task_id, stage="erro")
+                        progress.update(task_id, description=f"📄 {os.path.basename(pdf_filename)}", stage="erro")
+                        progress.advance(task_id)
                         continue
 
-                    # Analisa documento com IA
-                    progress.update(task_id, stage="analisando")
-                    result = self.ai_analyzer.analyze_document(markdown_content, keywords, config['verbose'])
+                    progress.update(task_id, description=f"📄 {os.path.basename(pdf_filename)}", stage="analisando")
+                    yield pdf_filename, markdown_content
+
+            # Analisa documentos com IA (chamadas simultâneas quando ai_workers > 1)
+            analyzed = self.ai_analyzer.analyze_documents_parallel(
+                converted_documents(),
+                verbose=config['verbose'],
+                max_workers=config['ai_workers']
+            )
+            for pdf_filename, result in analyzed:
+                progress.update(task_id, description=f"📄 {os.path.basename(pdf_filename)}")
 
+                # Caminho do CSV definido antes do processamento, para que a linha de erro
+                # seja gravada no arquivo correto mesmo quando a análise falha
+                output_path = os.path.join(config['output_path'], os.path.basename(os.path.dirname(pdf_filename)), 'resultados.csv')
+                try:
                     # Prepara dados para o CSV
-                    row_data = {
-                        'filename': pdf_filename,
-                        'company': result.get('company', ''),
-                        'date': result.get('date', ''),
-                        'resumo': result.get('resumo', ''),
-                        'tokens': result.get('tokens', '')
-                    }
-
-                    # Adiciona dados para cada palavra-chave
-                    for keyword in keywords:
-                        if keyword in result and isinstance(result[keyword], list):
-                            sentences = result[keyword]
-                            row_data[keyword] = ' | '.join(sentences) if sentences else ''
-                        else:
-                            row_data[keyword] = ''
-
-                    output_path = os.path.join(config['output_path'], os.path.basename(os.path.dirname(pdf_filename)), 'resultados.csv')
+                    row_data = self._build_row(pdf_filename, result, keywords)
 
                     # Salva resultado no CSV
                     progress.update(task_id, stage="salvando")
-                    self.csv_processor.save_single_result_with_keywords(
-                        row_data, 
-                        output_path, 
-                        keywords, 
-                        config['verbose']
-                    )
+                    save_row(row_data, output_path)
 
                     processed_count += 1
 
@@ -187,23 +224,12 @@ class KeywordAnalyzer:
                     progress.update(task_id, stage="erro")
 
                     # Salva linha com erro
-                    row_data = {
-                        'filename': pdf_filename,
-                        'company': '',
-                        'date': '',
-                        'resumo': ''
-                    }
-
-                    # Adiciona colunas vazias para cada palavra-chave
-                    for keyword in keywords:
-                        row_data[keyword] = ''
-
-                    self.csv_processor.save_single_result_with_keywords(
-                        row_data, 
-                        output_path, 
-                        keywords, 
-                        config['verbose']
-                    )
+                    row_data = self._build_row(pdf_filename, {}, keywords)
+
+                    try:
+                        save_row(row_data, output_path)
+                    except Exception as save_error:
+                        print(f"❌ Erro ao salvar resultado: {save_error}")
                 finally:
                     progress.advance(task_id)
         
@@ -218,6 +244,104 @@ class KeywordAnalyzer:
         self._show_summary(pdf_files, config['output_path'], processed_count)
 
 
+    @staticmethod
+    def _build_row(pdf_filename, result, keywords):
+        """
+        Monta a linha do CSV a partir do resultado da análise (função pura)
+
+        Args:
+            pdf_filename: Caminho do PDF analisado
+            result: Dicionário retornado pelo analisador ({} para uma linha de erro)
+            keywords: Lista de palavras-chave
+
+        Returns:
+            Dicionário com os dados da linha
+        """
+        row_data = {
+            'filename': pdf_filename,
+            'company': result.get('company', ''),
+            'date': result.get('date', ''),
+            'resumo': result.get('resumo', ''),
+            'tokens': result.get('tokens', '')
+        }
+
+        # Adiciona dados para cada palavra-chave
+        for keyword in keywords:
+            sentences = result.get(keyword)
+            if isinstance(sentences, list):
+                row_data[keyword] = ' | '.join(sentences) if sentences else ''
+            else:
+                row_data[keyword] = ''
+
+        return row_data
+
+    def _iter_markdown(self, pdf_files, config, on_convert=None, prefilter=None):
+        """
+        Converte os PDFs para Markdown, em paralelo quando max_workers > 1
+
+        Args:
+            pdf_files: Lista de caminhos dos PDFs
+            config: Configuração carregada
+            on_convert: Callback chamado antes de converter cada PDF (modo sequencial)
+            prefilter: Predicado repassado ao PDFProcessor para dispensar a conversão
+
+        Yields:
+            Tuplas (pdf_filename, markdown_content) na ordem de pdf_files, com
+            markdown_content None em caso de falha
+        """
+        max_workers = config.get('max_workers', 1)
+
+        if max_workers <= 1 or len(pdf_files) <= 1:
+            for pdf_filename in pdf_files:
+                if on_convert:
+                    on_convert(pdf_filename)
+                yield pdf_filename, self.pdf_processor.convert_single_pdf_to_markdown(
+                    pdf_filename,
+                    verbose=config['verbose'],
+                    backend=config['pdf_backend'],
+                    cache_dir=config['cache_dir'],
+                    prefilter=prefilter
+                )
+            return
+
+        # A conversão é CPU-bound: cada PDF roda em um processo separado e os
+        # resultados são consumidos no processo principal (escrita única no CSV).
+        # Os workers usam "spawn": um fork aqui copiaria a thread de atualização do
+        # rich e locks de print/logging possivelmente em uso, e o worker travaria.
+        workers = min(max_workers, len(pdf_files))
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_pdf_worker,
+            initargs=(max(1, DOCLING_NUM_THREADS // workers),)
+        ) as executor:
+            # Janela limitada de conversões em andamento, consumida na ordem de envio:
+            # as linhas chegam ao CSV na mesma ordem de pdf_files em toda execução
+            pending = deque()
+            remaining = iter(pdf_files)
+
+            def submit(pdf_filename):
+                future = executor.submit(
+                    _convert_pdf_worker, pdf_filename, config['verbose'], config['pdf_backend'], config['cache_dir'],
+                    prefilter
+                )
+                pending.append((pdf_filename, future))
+
+            for pdf_filename in islice(remaining, workers * 2):
+                submit(pdf_filename)
+            while pending:
+                pdf_filename, future = pending.popleft()
+                try:
+                    markdown_content = future.result()
+                except Exception as e:
+                    print(f"  ❌ Erro na conversão de {pdf_filename}: {e}")
+                    markdown_content = None
+                # Repõe a janela antes de entregar o resultado, mantendo os workers ocupados
+                next_pdf = next(remaining, None)
+                if next_pdf is not None:
+                    submit(next_pdf)
+                yield pdf_filename, markdown_content
+
     def _show_summary(self, pdf_files, output_path, processed_count):
         """Exibe resumo da análise"""
         print("📊 RESUMO DA ANÁLISE")
@@ -242,27 +366,25 @@ class KeywordAnalyzer:
                 for file in results_files:
                     print('-' * 50)
                     print(f"📋 Lendo arquivo: {file}")
-                    df = pd.read_csv(file)
+                    df = self.csv_processor.read_csv(file)
                     print(f"📋 Registros no CSV: {len(df)}")
 
                     # Estatísticas dos resultados
                     if not df.empty:
-                        companies_found = df['company'].str.len() > 0
-                        dates_found = df['date'].str.len() > 0
-                        
-                        tokens_sum = int(df['tokens'].sum())
-                        tokens_mean = int(df['tokens'].mean())
-
-                        print(f"🏢 Empresas identificadas: {companies_found.sum()}")
-                        print(f"📅 Datas extraídas: {dates_found.sum()}")
+                        filled = df.notna()
+                        tokens = pd.to_numeric(df['tokens'], errors='coerce') if 'tokens' in df else pd.Series(dtype=float)
+                        tokens_sum = int(tokens.sum())
+                        tokens_mean = int(tokens.mean()) if tokens.notna().any() else 0
+
+                        print(f"🏢 Empresas identificadas: {filled['company'].sum()}")
+                        print(f"📅 Datas extraídas: {filled['date'].sum()}")
                         print(f"⚙️ Tokens utilizados: {tokens_sum}")
                         print(f"⚙️ Média de tokens: {tokens_mean}")
 
                         # Conta palavras-chave encontradas
-                        keyword_columns = [col for col in df.columns if col not in ['filename', 'company', 'date', 'resumo', 'tokens']]
-                        for keyword in keyword_columns:
-                            keyword_found = df[keyword].str.len() > 0
-                            print(f"🔍 '{keyword}' encontrada: {keyword_found.sum()}")
+                        keyword_columns = [col for col in df.columns if col not in BASE_COLUMNS]
+                        for keyword, found in filled[keyword_columns].sum().items():
+                            print(f"🔍 '{keyword}' encontrada: {found}")
         except Exception as e:
             print(f"⚠️  Erro ao ler estatísticas do CSV: {e}")
 
@@ -284,4 +406,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Necessário para o ProcessPoolExecutor em executáveis gerados pelo PyInstaller
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
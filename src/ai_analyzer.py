@@ -3,26 +3,203 @@ Analisador IA - Extração de informações de documentos
 """
 
 import os
+import re
+import sys
 import json
-import pandas as pd
-from typing import Dict, List, Any, Optional
+import hashlib
+import functools
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Tuple
 import time
 from dotenv import load_dotenv
 
 from .ai_connector import AIConnectorFactory, AIConnector
+from .logger_manager import logger
+
+# orjson (opcional) faz o parse em código nativo; fallback para o json da stdlib
+try:
+    import orjson
+
+    def _json_loads(text: str) -> Any:
+        return orjson.loads(text.encode("utf-8"))
+except ImportError:  # pragma: no cover - dependência opcional
+    _json_loads = json.loads
+
+# pyahocorasick (opcional) procura todas as palavras-chave em uma única passada linear
+try:
+    import ahocorasick
+except ImportError:  # pragma: no cover - dependência opcional
+    ahocorasick = None
 from .config_manager import ConfigManager
 
-MAX_TOKENS = os.getenv("MAX_TOKENS", 128000)
+# Carrega o .env uma única vez, antes de ler as variáveis de ambiente do módulo
+load_dotenv()
+
+MAX_TOKENS = int(os.getenv("MAX_TOKENS", "128000"))
+RESULTS_CACHE_SIZE = 4096  # Documentos distintos mantidos no cache de resultados
+
+# Extrai o JSON de uma resposta opcionalmente cercada por ```json ... ```
+_JSON_FENCE_RE = re.compile(r"^\s*(?:```(?:json)?)?\s*(.*?)\s*(?:```)?\s*$", re.DOTALL)
+# Sequências de escape \n / \r que quebram o parse do JSON
+_ESCAPED_NEWLINE_RE = re.compile(r"\\[nr]")
+
+
+@functools.lru_cache(maxsize=32)
+def _keywords_pattern(keywords: Tuple[str, ...]) -> "re.Pattern[str]":
+    """
+    Compila uma única alternância com todas as palavras-chave (sem distinção de maiúsculas)
+    
+    Espaços da palavra-chave aceitam qualquer sequência de espaços/quebras de linha,
+    já que a conversão do PDF pode quebrar a expressão entre linhas.
+    """
+    alternatives = [
+        r"\s+".join(re.escape(part) for part in keyword.split())
+        for keyword in sorted(keywords, key=len, reverse=True)
+        if keyword.strip()
+    ]
+    return re.compile("|".join(alternatives), re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=32)
+def _keywords_automaton(keywords: Tuple[str, ...]):
+    """
+    Monta um autômato Aho-Corasick com o maior trecho sem espaços de cada palavra-chave
+    
+    Se nenhum desses trechos aparece no texto, nenhuma palavra-chave pode aparecer;
+    o autômato serve de filtro rápido antes da regex completa.
+    """
+    fragments = {max(keyword.lower().split(), key=len) for keyword in keywords if keyword.strip()}
+    if ahocorasick is None or not fragments:
+        return None
+    automaton = ahocorasick.Automaton()
+    for fragment in fragments:
+        automaton.add_word(fragment, fragment)
+    automaton.make_automaton()
+    return automaton
+
+
+def contains_keywords(text: str, keywords: Tuple[str, ...]) -> bool:
+    """Indica se alguma palavra-chave aparece no texto (sem distinção de maiúsculas)"""
+    automaton = _keywords_automaton(keywords)
+    if automaton is not None and next(automaton.iter(text.lower()), None) is None:
+        return False
+    return _keywords_pattern(keywords).search(text) is not None
+
+
+@functools.lru_cache(maxsize=32)
+def _build_prompts(keywords: Tuple[str, ...]) -> Tuple[str, str]:
+    """
+    Monta os prompts de sistema e de pergunta para uma lista de palavras-chave
+    
+    Args:
+        keywords: Palavras-chave (tupla, para servir de chave do cache)
+        
+    Returns:
+        Tupla (context_system, question)
+    """
+    # Cria prompt para extração de informações
+    keywords_str = ', '.join(keywords)
+    
+    context_system = f'''
+        Você é um assistente especializado em analisar documentos e extrair informações específicas.
+        
+        Sua tarefa é analisar o documento fornecido e extrair as seguintes informações OBRIGATÓRIAS:
+        
+        1. "company": Nome da empresa/companhia mencionada no documento
+        2. "date": Data de emissão ou referência do documento (formato YYYY-MM-DD)
+        3. "resumo": Resumo do documento em até 200 caracteres
+        
+        E para cada palavra-chave, extrair frases completas que a contenham:
+        
+        Palavras-chave para buscar: {keywords_str}
+        
+        Para cada palavra-chave encontrada, você deve extrair TODAS as frases completas que a contenham.
+        Se uma palavra-chave aparecer em múltiplas frases, inclua todas elas.
+        
+        REGRAS IMPORTANTES:
+        - Você DEVE retornar APENAS um JSON válido
+        - NÃO inclua explicações, comentários ou texto adicional
+        - NÃO use markdown ou formatação
+        - Se uma informação não for encontrada, use string vazia ""
+        - Para cada palavra-chave, retorne um array com todas as frases encontradas
+        - O resumo deve ser conciso e informativo
+        - Use o nome exato da palavra-chave como chave no JSON
+        - Escape corretamente caracteres especiais no JSON
+        
+        Exemplo de retorno (APENAS JSON):
+        {{
+            "company": "Nome da Empresa",
+            "date": "2023-10-15",
+            "resumo": "Documento sobre aumento de capital",
+            "aumento de capital": [
+                "A empresa anunciou um aumento de capital de R$ 10 milhões",
+                "O aumento de capital foi aprovado pelos acionistas"
+            ],
+            "ações": [
+                "Foram emitidas 100.000 ações ordinárias",
+                "As ações serão negociadas na B3"
+            ]
+        }}
+        '''
+    
+    question = f"""Analise o documento e extraia as informações solicitadas em um JSON valido. 
+        Para cada palavra-chave encontrada, extraia TODAS as frases completas que a contenham: {keywords_str}. 
+        A resposta deve conter apenas o JSON, sem nenhum outro texto adicional.
+        Informações obrigatórias:
+        - company: Nome da empresa/companhia mencionada no documento
+        - date: Data de emissão ou referência do documento (formato YYYY-MM-DD)
+        - resumo: Resumo do documento em até 200 caracteres
+        - Para cada palavra-chave, extrair frases completas que a contenham.
+        - Se uma palavra-chave aparecer em múltiplas frases, inclua todas elas.
+
+        Exemplo de retorno (APENAS JSON):
+        {{
+            "company": "Nome da Empresa",
+            "date": "2023-10-15",
+            "resumo": "Documento sobre aumento de capital",
+            "aumento de capital": [
+                "A empresa anunciou um aumento de capital de R$ 10 milhões",
+                "O aumento de capital foi aprovado pelos acionistas"
+            ],
+            "ações": [
+                "Foram emitidas 100.000 ações ordinárias",
+                "As ações serão negociadas na B3"
+            ]
+        }}
+        """
+    
+    return context_system, question
+
 
 class AIAnalyzer:
     """Analisador que utiliza IA para extrair informações de documentos"""
     
+    __slots__ = (
+        "config_manager",
+        "provider",
+        "model_name",
+        "connector",
+        "skip_without_keywords",
+        "cache_dir",
+        "_keywords",
+        "_results_cache",
+        "_cache_lock",
+    )
+    
     def __init__(self, provider: str = "openai", model_name: str = None):
-        load_dotenv()
         self.config_manager = ConfigManager()
         self.provider = provider
         self.model_name = model_name
         self.connector = None
+        # Quando True, documentos sem nenhuma palavra-chave não são enviados ao modelo
+        self.skip_without_keywords = False
+        # Diretório do cache em disco das respostas (None desativa)
+        self.cache_dir: Optional[str] = None
+        self._keywords: Tuple[str, ...] = ()
+        self._results_cache: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
         
         # Inicializa o conector apropriado
         self._initialize_connector()
@@ -46,8 +223,19 @@ class AIAnalyzer:
         """Atualiza o provedor e modelo a ser utilizado"""
         self.provider = provider
         self.model_name = model_name
+        self._results_cache.clear()
         self._initialize_connector()
     
+    def set_keywords(self, keywords: List[str]) -> None:
+        """
+        Define as palavras-chave padrão usadas quando analyze_document não recebe uma lista
+        
+        Args:
+            keywords: Lista de palavras-chave para buscar
+        """
+        # Tupla única (e internada) reaproveitada como chave dos caches de prompt/regex
+        self._keywords = tuple(sys.intern(keyword) for keyword in keywords)
+    
     def is_configured(self) -> bool:
         """Verifica se o conector está configurado"""
         return self.connector is not None and self.connector.is_configured()
@@ -60,29 +248,98 @@ class AIAnalyzer:
         max_attempts: int = 3,
         initial_delay_seconds: float = 1.0,
         backoff_multiplier: float = 2.0,
+        precounted_tokens: Optional[int] = None,
     ) -> str:
         """Chama o conector com retries e backoff exponencial."""
         attempt_number = 1
         delay_seconds = initial_delay_seconds
         while True:
             try:
-                return self.connector.generate_response(messages, max_tokens)
+                return self.connector.generate_response(
+                    messages, max_tokens, precounted_tokens=precounted_tokens
+                )
             except Exception as error:
                 if attempt_number >= max_attempts:
                     raise
                 if verbose:
-                    print(
-                        f"⚠️ Falha na chamada ao modelo (tentativa {attempt_number}/{max_attempts}): {error}. "
-                        f"Retentando em {delay_seconds:.1f}s"
+                    logger.warning(
+                        "⚠️ Falha na chamada ao modelo (tentativa %d/%d): %s. Retentando em %.1fs",
+                        attempt_number, max_attempts, error, delay_seconds,
                     )
                 time.sleep(delay_seconds)
                 attempt_number += 1
                 delay_seconds *= backoff_multiplier
     
+    @staticmethod
+    def _cache_key(document_content: str, keywords: Tuple[str, ...]) -> bytes:
+        """Gera a chave do cache a partir do hash do conteúdo e das palavras-chave"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update("\x1f".join(keywords).encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(document_content.encode("utf-8"))
+        return digest.digest()
+
+    def _recall(self, cache_key: bytes) -> Optional[Dict[str, Any]]:
+        """Recupera um resultado do cache LRU"""
+        with self._cache_lock:
+            cached = self._results_cache.get(cache_key)
+            if cached is None:
+                return None
+            self._results_cache.move_to_end(cache_key)
+            return dict(cached)
+
+    def _remember(self, cache_key: bytes, data: Dict[str, Any]) -> None:
+        """Armazena um resultado no cache LRU"""
+        with self._cache_lock:
+            self._results_cache[cache_key] = dict(data)
+            if len(self._results_cache) > RESULTS_CACHE_SIZE:
+                self._results_cache.popitem(last=False)
+    
+    def _response_cache_path(self, messages: List[Dict[str, str]]) -> Optional[str]:
+        """
+        Caminho do cache em disco para a resposta a estas mensagens
+        
+        Args:
+            messages: Mensagens enviadas ao modelo
+            
+        Returns:
+            Caminho do arquivo JSON, ou None se o cache estiver desativado
+        """
+        if not self.cache_dir or os.getenv("AI_CACHE_DISABLE") == "1":
+            return None
+        digest = hashlib.sha256()
+        for part in (self.provider, self.model_name or "", *(message["content"] for message in messages)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        key = digest.hexdigest()
+        return os.path.join(self.cache_dir, "responses", key[:2], f"{key}.json")
+    
+    @staticmethod
+    def _load_cached_response(cache_path: str) -> Optional[Dict[str, Any]]:
+        """Lê uma resposta do cache em disco (None se ausente, corrompida ou sem formato de resultado)"""
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                data = _json_loads(f.read())
+        except (OSError, ValueError):
+            return None
+        return data if isinstance(data, dict) else None
+    
+    @staticmethod
+    def _store_cached_response(cache_path: str, data: Dict[str, Any]) -> None:
+        """Grava uma resposta no cache em disco sem deixar arquivo parcial"""
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning("⚠️ Não foi possível gravar o cache de resposta: %s", e)
+    
     def analyze_document(
         self, 
         document_content: str, 
-        keywords: List[str],
+        keywords: Optional[List[str]] = None,
         verbose: bool = False
     ) -> Dict[str, Any]:
         """
@@ -90,7 +347,7 @@ class AIAnalyzer:
         
         Args:
             document_content: Conteúdo do documento
-            keywords: Lista de palavras-chave para buscar
+            keywords: Lista de palavras-chave para buscar (padrão: as definidas em set_keywords)
             verbose: Modo verboso
             
         Returns:
@@ -99,76 +356,22 @@ class AIAnalyzer:
         if not self.is_configured():
             return {"error": "Conector de IA não configurado"}
         
-        # Cria prompt para extração de informações
-        keywords_str = ', '.join(keywords)
-        
-        context_system = f'''
-        Você é um assistente especializado em analisar documentos e extrair informações específicas.
-        
-        Sua tarefa é analisar o documento fornecido e extrair as seguintes informações OBRIGATÓRIAS:
+        keywords = self._keywords if keywords is None else tuple(keywords)
         
-        1. "company": Nome da empresa/companhia mencionada no documento
-        2. "date": Data de emissão ou referência do documento (formato YYYY-MM-DD)
-        3. "resumo": Resumo do documento em até 200 caracteres
+        # Documentos repetidos (mesmo conteúdo e palavras-chave) reaproveitam o resultado
+        cache_key = self._cache_key(document_content, keywords)
+        cached = self._recall(cache_key)
+        if cached is not None:
+            return cached
         
-        E para cada palavra-chave, extrair frases completas que a contenham:
+        # Pré-checagem local: evita a chamada ao modelo quando nenhuma palavra-chave aparece
+        if self.skip_without_keywords and not contains_keywords(document_content, keywords):
+            data = {"company": "", "date": "", "resumo": "", "tokens": 0}
+            data.update({keyword: [] for keyword in keywords})
+            return data
         
-        Palavras-chave para buscar: {keywords_str}
-        
-        Para cada palavra-chave encontrada, você deve extrair TODAS as frases completas que a contenham.
-        Se uma palavra-chave aparecer em múltiplas frases, inclua todas elas.
-        
-        REGRAS IMPORTANTES:
-        - Você DEVE retornar APENAS um JSON válido
-        - NÃO inclua explicações, comentários ou texto adicional
-        - NÃO use markdown ou formatação
-        - Se uma informação não for encontrada, use string vazia ""
-        - Para cada palavra-chave, retorne um array com todas as frases encontradas
-        - O resumo deve ser conciso e informativo
-        - Use o nome exato da palavra-chave como chave no JSON
-        - Escape corretamente caracteres especiais no JSON
-        
-        Exemplo de retorno (APENAS JSON):
-        {{
-            "company": "Nome da Empresa",
-            "date": "2023-10-15",
-            "resumo": "Documento sobre aumento de capital",
-            "aumento de capital": [
-                "A empresa anunciou um aumento de capital de R$ 10 milhões",
-                "O aumento de capital foi aprovado pelos acionistas"
-            ],
-            "ações": [
-                "Foram emitidas 100.000 ações ordinárias",
-                "As ações serão negociadas na B3"
-            ]
-        }}
-        '''
-        
-        question = f"""Analise o documento e extraia as informações solicitadas em um JSON valido. 
-        Para cada palavra-chave encontrada, extraia TODAS as frases completas que a contenham: {keywords_str}. 
-        A resposta deve conter apenas o JSON, sem nenhum outro texto adicional.
-        Informações obrigatórias:
-        - company: Nome da empresa/companhia mencionada no documento
-        - date: Data de emissão ou referência do documento (formato YYYY-MM-DD)
-        - resumo: Resumo do documento em até 200 caracteres
-        - Para cada palavra-chave, extrair frases completas que a contenham.
-        - Se uma palavra-chave aparecer em múltiplas frases, inclua todas elas.
-
-        Exemplo de retorno (APENAS JSON):
-        {{
-            "company": "Nome da Empresa",
-            "date": "2023-10-15",
-            "resumo": "Documento sobre aumento de capital",
-            "aumento de capital": [
-                "A empresa anunciou um aumento de capital de R$ 10 milhões",
-                "O aumento de capital foi aprovado pelos acionistas"
-            ],
-            "ações": [
-                "Foram emitidas 100.000 ações ordinárias",
-                "As ações serão negociadas na B3"
-            ]
-        }}
-        """
+        # Prompts dependem apenas das palavras-chave: montados uma vez por lista
+        context_system, question = _build_prompts(keywords)
         
         messages = [
             {
@@ -181,6 +384,13 @@ class AIAnalyzer:
             }
         ]
         
+        # Mesmo modelo e mesmo prompt: reaproveita a resposta de execuções anteriores
+        response_cache_path = self._response_cache_path(messages)
+        if response_cache_path:
+            data = self._load_cached_response(response_cache_path)
+            if data is not None:
+                self._remember(cache_key, data)
+                return data
 
         # Verifica se o número de tokens excede o limite
         tokens = self.connector.count_tokens(messages)
@@ -202,24 +412,22 @@ class AIAnalyzer:
                     max_attempts=3,
                     initial_delay_seconds=1.0,
                     backoff_multiplier=2.0,
+                    precounted_tokens=tokens,
                 )
 
-                # if verbose:
-                #     print(f"🤖 Resposta da IA (tentativa {attempt_index}): {resposta_texto[:200]}...")
+                # Formatação preguiçosa: o recorte de 200 caracteres só ocorre se o DEBUG for emitido
+                if verbose:
+                    logger.debug("🤖 Resposta da IA (tentativa %d): %.200s...", attempt_index, resposta_texto)
 
                 # Limpa possíveis formatações markdown
-                cleaned_result = resposta_texto.strip()
-                if cleaned_result.startswith('```json'):
-                    cleaned_result = cleaned_result[7:]
-                if cleaned_result.endswith('```'):
-                    cleaned_result = cleaned_result[:-3]
-                cleaned_result = cleaned_result.strip()
+                fence_match = _JSON_FENCE_RE.match(resposta_texto)
+                cleaned_result = fence_match.group(1) if fence_match else resposta_texto.strip()
 
                 # Remove possíveis caracteres de escape problemáticos
-                cleaned_result = cleaned_result.replace('\\n', ' ').replace('\\r', ' ')
+                cleaned_result = _ESCAPED_NEWLINE_RE.sub(' ', cleaned_result)
 
                 try:
-                    data = json.loads(cleaned_result)
+                    data = _json_loads(cleaned_result)
 
                     # Garante que todas as chaves obrigatórias existam
                     required_keys = ["company", "date", "resumo"]
@@ -228,20 +436,23 @@ class AIAnalyzer:
                             data[key] = ""
 
                     data['tokens'] = tokens
+                    self._remember(cache_key, data)
+                    if response_cache_path:
+                        self._store_cached_response(response_cache_path, data)
                     return data
-                except json.JSONDecodeError as parse_error:
+                except ValueError as parse_error:  # json.JSONDecodeError e orjson.JSONDecodeError
                     # Se não for a última tentativa, aguarda e tenta novamente buscando nova resposta
                     if attempt_index < parse_max_attempts:
                         if verbose:
-                            print(
-                                f"⚠️ Erro ao fazer parse do JSON (tentativa {attempt_index}/{parse_max_attempts}): {parse_error}. "
-                                f"Retentando em {1.0 * (2 ** (attempt_index - 1)):.1f}s"
+                            logger.warning(
+                                "⚠️ Erro ao fazer parse do JSON (tentativa %d/%d): %s. Retentando em %.1fs",
+                                attempt_index, parse_max_attempts, parse_error, 1.0 * (2 ** (attempt_index - 1)),
                             )
                         time.sleep(1.0 * (2 ** (attempt_index - 1)))
                         continue
                     # Última tentativa: retorna erro
                     if verbose:
-                        print(f"❌ Resposta recebida (inválida): {resposta_texto}")
+                        logger.error("❌ Resposta recebida (inválida): %s", resposta_texto)
                     return {
                         "company": "",
                         "date": "",
@@ -259,7 +470,52 @@ class AIAnalyzer:
             }
 
 
+    def analyze_documents_parallel(
+        self,
+        documents: Iterable[Tuple[str, str]],
+        keywords: Optional[List[str]] = None,
+        verbose: bool = False,
+        max_workers: int = 8
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Analisa vários documentos em paralelo com um ThreadPoolExecutor
+        
+        As chamadas ao modelo são I/O-bound (HTTP), então threads sobrepõem a
+        espera de rede. Os documentos são consumidos sob demanda: no máximo
+        2 * max_workers análises ficam na fila ao mesmo tempo.
+        
+        Args:
+            documents: Iterável de pares (identificador, conteúdo)
+            keywords: Lista de palavras-chave para buscar (padrão: as definidas em set_keywords)
+            verbose: Modo verboso
+            max_workers: Número máximo de chamadas simultâneas
+            
+        Yields:
+            Pares (identificador, resultado) na mesma ordem de documents
+        """
+        max_workers = max(1, max_workers)
+
+        def result_of(key, future):
+            try:
+                return key, future.result()
+            except Exception as e:
+                return key, {"error": f"Erro na análise: {e}"}
+
+        # Fila na ordem de chegada: a saída segue a ordem dos documentos, e a
+        # fila nunca passa do dobro de max_workers (mantém as threads ocupadas
+        # enquanto o primeiro da fila ainda não terminou)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for key, content in documents:
+                pending.append((key, executor.submit(self.analyze_document, content, keywords, verbose)))
+                if len(pending) >= max_workers * 2:
+                    yield result_of(*pending.popleft())
+
+            while pending:
+                yield result_of(*pending.popleft())
+
+
 # Mantém compatibilidade com código existente
 class OpenAIAnalyzer(AIAnalyzer):
     """Alias para compatibilidade com código existente"""
-    pass 
\ No newline at end of file
+    __slots__ = () 
\ No newline at end of file
@@ -4,27 +4,49 @@ Conectores de IA - Interface unificada para diferentes provedores de IA
 
 import os
 import json
+import functools
+import threading
+import importlib.util
 import requests
-import tiktoken
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, List, Any, Optional
 from abc import ABC, abstractmethod
 from dotenv import load_dotenv
 
 from .local_model import LocalModelManager
 
-TIMEOUT = os.getenv("TIMEOUT", 120) #120s = 2min
+# Carrega o .env uma única vez, antes de ler as variáveis de ambiente do módulo
+load_dotenv()
+
+TIMEOUT = float(os.getenv("TIMEOUT", "120")) #120s = 2min
+
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    """Carrega o encoding do tiktoken uma única vez por modelo"""
+    # Importado só no primeiro uso: execuções com modelo local não pagam o import
+    import tiktoken
+    return tiktoken.encoding_for_model(model)
 
 class AIConnector(ABC):
     """Classe abstrata para conectores de IA"""
     
+    __slots__ = ()
+    
     @abstractmethod
     def is_configured(self) -> bool:
         """Verifica se o conector está configurado"""
         pass
     
     @abstractmethod
-    def generate_response(self, messages: List[Dict[str, str]], max_tokens: int = 16384) -> str:
-        """Gera resposta do modelo de IA"""
+    def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 16384,
+        precounted_tokens: Optional[int] = None,
+    ) -> str:
+        """Gera resposta do modelo de IA (precounted_tokens evita recontar as mensagens)"""
         pass
     
     @abstractmethod
@@ -36,20 +58,32 @@ class AIConnector(ABC):
 class OpenAIConnector(AIConnector):
     """Conector para OpenAI API"""
     
+    __slots__ = ("api_key", "_client", "_configured")
+    
+    # Protege a criação preguiçosa do cliente quando várias threads chamam a API
+    _client_lock = threading.Lock()
+    
     def __init__(self):
-        load_dotenv()
         self.api_key = os.getenv("OPENAI_API_KEY")
+        self._client = None
         self._configured = False
         
         if self.api_key:
-            try:
-                from openai import OpenAI
-                self.client = OpenAI()
-                self._configured = True
-            except ImportError:
+            # Só verifica se o pacote existe; o import e o cliente ficam para a primeira chamada
+            if importlib.util.find_spec("openai") is None:
                 print("Aviso: openai não está instalado. Execute: pip install openai")
-            except Exception as e:
-                print(f"Aviso: OpenAI não configurada: {e}")
+            else:
+                self._configured = True
+    
+    @property
+    def client(self):
+        """Cliente OpenAI, criado no primeiro acesso"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    self._client = OpenAI()
+        return self._client
     
     def is_configured(self) -> bool:
         return self._configured and self.api_key is not None
@@ -57,26 +91,31 @@ class OpenAIConnector(AIConnector):
     def count_tokens(self, messages: List[Dict[str, str]]) -> int:
         """Conta tokens usando tiktoken"""
         try:
-            encoding = tiktoken.encoding_for_model("gpt-4o")
-            num_tokens = 0
+            encoding = _get_encoding("gpt-4o")
             
-            for message in messages:
-                num_tokens += 4  # overhead por mensagem
-                for key, value in message.items():
-                    num_tokens += len(encoding.encode(value))
+            # Um único encode_batch (núcleo em Rust, paralelo) para todos os campos
+            values = [value for message in messages for value in message.values()]
+            num_tokens = sum(len(tokens) for tokens in encoding.encode_batch(values))
             
+            num_tokens += 4 * len(messages)  # overhead por mensagem
             num_tokens += 2  # tokens adicionais do sistema
             return num_tokens
         except Exception as e:
             print(f"Erro ao contar tokens: {e}")
             return 0
     
-    def generate_response(self, messages: List[Dict[str, str]], max_tokens: int = 16384) -> str:
+    def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 16384,
+        precounted_tokens: Optional[int] = None,
+    ) -> str:
         """Gera resposta via OpenAI API"""
         if not self.is_configured():
             raise Exception("OpenAI não está configurada")
         
-        tokens = self.count_tokens(messages)
+        # Reaproveita a contagem já feita pelo chamador (evita um segundo encode do prompt)
+        tokens = precounted_tokens if precounted_tokens is not None else self.count_tokens(messages)
         if tokens > 16384:
             raise Exception(f"Mensagem muito longa. Tokens: {tokens}")
         
@@ -92,8 +131,16 @@ class OpenAIConnector(AIConnector):
                 frequency_penalty=0.0,
                 presence_penalty=0.0,
                 max_tokens=max_tokens,
+                stream=True,
             )
-            return response.choices[0].message.content
+            # Recebe a resposta em blocos conforme é gerada (mesmo formato do conector local)
+            parts = []
+            for chunk in response:
+                for choice in chunk.choices:
+                    content = choice.delta.content
+                    if content:
+                        parts.append(content)
+            return "".join(parts)
         except Exception as e:
             raise Exception(f"Erro na API OpenAI: {e}")
 
@@ -101,11 +148,31 @@ class OpenAIConnector(AIConnector):
 class LocalAIConnector(AIConnector):
     """Conector para modelos locais via Ollama"""
     
+    __slots__ = ("model_name", "local_manager", "_configured", "_session")
+    
     def __init__(self, model_name: str):
         self.model_name = model_name
-        self.local_manager = LocalModelManager()
+        
+        # Sessão persistente: reaproveita a conexão keep-alive com o Ollama entre documentos.
+        # Sem retries no adapter: quem retenta é AIAnalyzer._generate_with_retry, e a
+        # verificação is_ollama_running responde na primeira falha
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=16,
+            max_retries=Retry(total=0),
+        )
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        
+        # O gerenciador usa a mesma sessão para /api/tags (verificação e lista de modelos)
+        self.local_manager = LocalModelManager(session=self._session)
         self._configured = self.local_manager.is_ollama_running()
     
+    def close(self) -> None:
+        """Fecha a sessão HTTP compartilhada com o Ollama"""
+        self._session.close()
+    
     def is_configured(self) -> bool:
         """Verifica se Ollama está rodando e modelo existe"""
         if not self._configured:
@@ -126,7 +193,12 @@ class LocalAIConnector(AIConnector):
         total_chars = sum(len(msg.get('content', '')) for msg in messages)
         return total_chars // 4
     
-    def generate_response(self, messages: List[Dict[str, str]], max_tokens: int = 128000) -> str:
+    def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 128000,
+        precounted_tokens: Optional[int] = None,
+    ) -> str:
         """Gera resposta via Ollama API local"""
         if not self.is_configured():
             raise Exception(f"Modelo local '{self.model_name}' não está configurado")
@@ -135,7 +207,7 @@ class LocalAIConnector(AIConnector):
             payload = {
                 "model": self.model_name,
                 "messages": messages,
-                "stream": False,
+                "stream": True,
                 "options": {
                     "temperature": 0.0,
                     "top_p": 1.0,
@@ -143,17 +215,32 @@ class LocalAIConnector(AIConnector):
                 }
             }
             
-            response = requests.post(
+            # Com stream=True o timeout vale entre blocos recebidos, não para a resposta inteira
+            with self._session.post(
                 f"{self.local_manager.base_url}/v1/chat/completions",
                 json=payload,
                 timeout=TIMEOUT,  # Timeout maior para modelos locais
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"Erro na API Ollama: {response.status_code} - {response.text}")
+                stream=True,
+            ) as response:
+                if response.status_code != 200:
+                    raise Exception(f"Erro na API Ollama: {response.status_code} - {response.text}")
+                
+                # Server-sent events ("data: {...}") sem charset declarado
+                response.encoding = "utf-8"
+                parts = []
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    for choice in chunk.get("choices", []):
+                        content = (choice.get("delta") or {}).get("content")
+                        if content:
+                            parts.append(content)
             
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
+            return "".join(parts)
             
         except requests.exceptions.Timeout:
             raise Exception("Timeout na resposta do modelo local")
@@ -193,5 +280,5 @@ class AIConnectorFactory:
     @staticmethod
     def get_supported_local_models() -> List[str]:
         """Retorna lista de modelos locais suportados"""
-        local_manager = LocalModelManager()
-        return local_manager.get_supported_models() 
\ No newline at end of file
+        with LocalModelManager() as local_manager:
+            return local_manager.get_supported_models() 
\ No newline at end of file
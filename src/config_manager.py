@@ -3,8 +3,39 @@ Gerenciador de Configuração - Carrega configurações do sistema
 """
 
 import os
+import stat
 import configparser
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Mapping
+
+# tomllib é stdlib a partir do Python 3.11; tomli é o backport para versões anteriores
+try:
+    import tomllib
+except ImportError:  # pragma: no cover - depende da versão do Python
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+# Arquivos procurados quando nenhum caminho é informado (o primeiro existente vence)
+DEFAULT_CONFIG_FILES = ("config.toml", "config.ini")
+
+# Valores aceitos como verdadeiro nas opções booleanas
+_TRUE = frozenset({'1', 'true', 'yes', 'y', 's', 'sim', 't'})
+
+
+def _bool(section, key: str, default: str = 'false') -> bool:
+    """Lê uma opção booleana da seção de configuração"""
+    return section.get(key, default).strip().lower() in _TRUE
+
+
+def _int(section, key: str, default: int = 1) -> int:
+    """Lê uma opção inteira da seção de configuração; valor inválido usa o padrão"""
+    value = section.get(key, str(default))
+    try:
+        return int(value)
+    except ValueError:
+        print(f"⚠️  Aviso: '{key}' deve ser um número inteiro (recebido '{value}'). Usando {default}")
+        return default
 
 
 class ConfigManager:
@@ -24,27 +55,119 @@ class ConfigManager:
             # Opções de processamento
             "verbose": True,
             "keep_markdown": False,
+            "max_workers": 1,
+            "pdf_backend": "docling",
+            "cache_dir": "",
+            "ai_workers": 1,
+            "skip_without_keywords": False,
         }
+        # Configurações já lidas, por (caminho absoluto, mtime_ns, tamanho) do arquivo
+        self._config_cache: Dict[tuple, Dict[str, Any]] = {}
+        # Parser reaproveitado entre leituras (esvaziado antes de cada uso)
+        self._parser = configparser.ConfigParser()
     
-    def load_config(self, config_file: str = "config.ini") -> Dict[str, Any]:
+    @staticmethod
+    def _probe(path: str) -> Optional[str]:
         """
-        Carrega configuração do arquivo config.ini
+        Identifica o tipo de um caminho com uma única chamada a os.stat
         
         Args:
-            config_file: Caminho para o arquivo de configuração
+            path: Caminho a verificar
+            
+        Returns:
+            'file', 'dir' ou None se o caminho não existir (ou for de outro tipo)
+        """
+        try:
+            mode = os.stat(path).st_mode
+        except (OSError, ValueError):
+            return None
+        if stat.S_ISDIR(mode):
+            return "dir"
+        if stat.S_ISREG(mode):
+            return "file"
+        return None
+    
+    def _read_section(self, config_file: str, data: bytes) -> Optional[Mapping[str, str]]:
+        """
+        Extrai a seção [CONFIG] de um arquivo .toml ou .ini
+        
+        Args:
+            config_file: Caminho do arquivo (a extensão define o formato)
+            data: Conteúdo bruto do arquivo
+            
+        Returns:
+            Mapeamento chave -> valor (texto), ou None se a seção não existir
+        """
+        if config_file.lower().endswith(".toml"):
+            if tomllib is None:
+                raise ImportError("suporte a TOML requer Python 3.11+ ou o pacote tomli")
+            section = tomllib.loads(data.decode('utf-8')).get("CONFIG")
+            if section is None:
+                return None
+            # Normaliza para texto, como no configparser (true -> "true", 4 -> "4")
+            return {
+                key: str(value).lower() if isinstance(value, bool) else str(value)
+                for key, value in section.items()
+            }
+        
+        # clear() não remove a seção DEFAULT, então os defaults são limpos à parte
+        parser = self._parser
+        parser.clear()
+        parser.defaults().clear()
+        parser.read_string(data.decode('utf-8'), source=config_file)
+        return parser['CONFIG'] if 'CONFIG' in parser else None
+    
+    def resolve_config_file(self, config_file: Optional[str] = None) -> str:
+        """
+        Define o arquivo de configuração a utilizar
+        
+        Args:
+            config_file: Caminho explícito; se omitido, usa config.toml quando existir
+                e, caso contrário, config.ini
+            
+        Returns:
+            Caminho do arquivo de configuração
+        """
+        if config_file is not None:
+            return config_file
+        return next(
+            (path for path in DEFAULT_CONFIG_FILES if self._probe(path) == "file"),
+            DEFAULT_CONFIG_FILES[-1],
+        )
+    
+    def load_config(self, config_file: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Carrega configuração do arquivo config.toml ou config.ini
+        
+        Args:
+            config_file: Caminho para o arquivo de configuração (.toml ou .ini). Se omitido,
+                usa config.toml quando existir e, caso contrário, config.ini
             
         Returns:
             Dicionário com configurações
         """
+        config_file = self.resolve_config_file(config_file)
+        
         config = self.default_config.copy()
         
-        if os.path.exists(config_file):
+        try:
+            st = os.stat(config_file)
+        except OSError:
+            st = None
+        
+        if st is not None:
+            # Arquivo inalterado desde a última leitura: reaproveita sem reprocessar
+            cache_key = (os.path.abspath(config_file), st.st_mtime_ns, st.st_size)
+            cached = self._config_cache.get(cache_key)
+            if cached is not None:
+                return cached.copy()
+            
             try:
-                parser = configparser.ConfigParser()
-                parser.read(config_file, encoding='utf-8')
+                with open(config_file, 'rb') as f:
+                    data = f.read()
                 
-                if 'CONFIG' in parser:
-                    config_section = parser['CONFIG']
+                config_section = self._read_section(config_file, data)
+                if config_section is not None:
                     
                     # Diretórios e arquivos
                     config["keywords_list"] = config_section.get("keywords_list", "keywords.txt")
@@ -56,8 +179,15 @@ class ConfigManager:
                     config["ai_model"] = config_section.get("ai_model", "gpt-4o")
                     
                     # Opções de processamento
-                    config["verbose"] = config_section.get("verbose", "true").lower() in ('1', 'true')
-                    config["keep_markdown"] = config_section.get("keep_markdown", "false").lower() in ('1', 'true')
+                    config["verbose"] = _bool(config_section, "verbose", "true")
+                    config["keep_markdown"] = _bool(config_section, "keep_markdown")
+                    config["max_workers"] = _int(config_section, "max_workers")
+                    config["pdf_backend"] = config_section.get("pdf_backend", "docling").lower()
+                    config["cache_dir"] = config_section.get("cache_dir", "")
+                    config["ai_workers"] = _int(config_section, "ai_workers")
+                    config["skip_without_keywords"] = _bool(config_section, "skip_without_keywords")
+                
+                self._config_cache[cache_key] = config.copy()
                     
             except Exception as e:
                 print(f"⚠️  Aviso: Erro ao carregar configuração de '{config_file}': {e}")
@@ -88,6 +218,11 @@ class ConfigManager:
             # Opções de processamento
             "verbose": "false",
             "keep_markdown": "false",
+            "max_workers": "1",
+            "pdf_backend": "docling",
+            "cache_dir": "",
+            "ai_workers": "1",
+            "skip_without_keywords": "false",
         }
         
         try:
@@ -109,10 +244,11 @@ class ConfigManager:
         """
         keywords = []
         
-        if os.path.exists(keywords_file):
+        if self._probe(keywords_file) == "file":
             try:
                 with open(keywords_file, 'r', encoding='utf-8') as f:
-                    keywords = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+                    # strip uma única vez por linha; comentários indentados também são ignorados
+                    keywords = [kw for kw in (line.strip() for line in f) if kw and not kw.startswith('#')]
             except Exception as e:
                 print(f"❌ Erro ao carregar keywords de '{keywords_file}': {e}")
         else:
@@ -136,7 +272,7 @@ class ConfigManager:
             print("❌ Diretório de PDFs não especificado")
             return False
         
-        if not os.path.exists(pdf_dir):
+        if self._probe(pdf_dir) != "dir":
             print(f"❌ Diretório '{pdf_dir}' não existe")
             return False
         
@@ -146,7 +282,7 @@ class ConfigManager:
             print("❌ Arquivo de keywords não especificado")
             return False
         
-        if not os.path.exists(keywords_file):
+        if self._probe(keywords_file) != "file":
             print(f"❌ Arquivo de keywords '{keywords_file}' não existe")
             return False
         
@@ -165,4 +301,21 @@ class ConfigManager:
                 print("❌ Modelo de IA é obrigatório para provedor local")
                 return False
         
+        # Valida backend de conversão de PDF
+        valid_backends = ["docling", "pdfium", "pymupdf", "text", "auto"]
+        pdf_backend = config.get("pdf_backend", "docling")
+        if pdf_backend not in valid_backends:
+            print(f"❌ Backend de PDF inválido: {pdf_backend}")
+            print(f"   Backends válidos: {', '.join(valid_backends)}")
+            return False
+        
+        # Valida número de processos
+        if config.get("max_workers", 1) < 1:
+            print("❌ max_workers deve ser maior ou igual a 1")
+            return False
+        
+        if config.get("ai_workers", 1) < 1:
+            print("❌ ai_workers deve ser maior ou igual a 1")
+            return False
+        
         return True 
\ No newline at end of file
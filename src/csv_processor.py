@@ -3,64 +3,129 @@ Processador de CSV - Salvamento de resultados
 """
 
 import os
-import pandas as pd
-from typing import List, Dict, Any
+import csv
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, List, Set, Iterator
+
+# pandas só é importado nos métodos que o utilizam (a escrita de linhas usa apenas o csv)
+if TYPE_CHECKING:  # pragma: no cover
+    import pandas as pd
+
+# Colunas fixas do CSV de resultados; as palavras-chave vêm em seguida
+BASE_COLUMNS = ['filename', 'company', 'date', 'resumo', 'tokens']
 
 
 class CSVProcessor:
     """Processador de arquivos CSV"""
     
     def __init__(self):
-        pass
+        # Diretórios de saída já criados/verificados nesta execução
+        self._ensured_dirs: Set[str] = set()
     
+    def _ensure_dir(self, output_path: str) -> None:
+        """Cria o diretório do arquivo uma única vez por execução"""
+        directory = os.path.dirname(output_path)
+        if directory and directory not in self._ensured_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._ensured_dirs.add(directory)
     
-    def save_single_result_with_keywords(self, result: Dict[str, Any], output_path: str, keywords: List[str], verbose: bool = False) -> None:
+    def _prepare_existing(self, output_path: str, fieldnames: List[str], verbose: bool = False) -> List[str]:
         """
-        Salva um único resultado no CSV com colunas dinâmicas baseadas nas palavras-chave
+        Ajusta um CSV existente para receber novas linhas
+        
+        Se o cabeçalho existente não contém todas as colunas, o arquivo é
+        reescrito uma única vez com as colunas que faltam.
+        
+        Args:
+            output_path: Caminho do arquivo
+            fieldnames: Colunas desejadas
+            verbose: Modo verboso
+            
+        Returns:
+            Colunas a utilizar na escrita (ordem do arquivo existente)
+        """
+        try:
+            with open(output_path, 'r', newline='', encoding='utf-8') as f:
+                reader = csv.DictReader(f)
+                header = list(reader.fieldnames or [])
+                missing = [col for col in fieldnames if col not in header]
+                if not missing:
+                    return header
+                rows = list(reader)
+        except Exception as e:
+            # Se não conseguir ler o CSV existente, cria um novo
+            if verbose:
+                print(f"  ⚠️  Erro ao ler CSV existente, criando novo: {e}")
+            with open(output_path, 'w', newline='', encoding='utf-8'):
+                pass
+            return list(fieldnames)
+        
+        merged = header + missing
+        with open(output_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=merged, restval='', extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+        return merged
+    
+    @contextmanager
+    def open_writer(self, output_path: str, fieldnames: List[str], verbose: bool = False) -> Iterator[csv.DictWriter]:
+        """
+        Abre o CSV de resultados uma única vez para gravação incremental
+        
+        As linhas são acrescentadas ao arquivo (line-buffered, cada linha vai
+        para o disco ao ser escrita) sem reler ou reescrever o conteúdo anterior.
         
         Args:
-            result: Dicionário com os dados do resultado
             output_path: Caminho para salvar o arquivo
-            keywords: Lista de palavras-chave para criar colunas
+            fieldnames: Colunas do CSV (BASE_COLUMNS + palavras-chave)
             verbose: Modo verboso
+            
+        Yields:
+            csv.DictWriter posicionado no final do arquivo
         """
-        # Cria diretório se não existir
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        self._ensure_dir(output_path)
         
+        # Um único stat responde "existe?" e "está vazio?"
         try:
-            # Define as colunas baseadas nas palavras-chave
-            columns = ['filename', 'company', 'date', 'resumo'] + keywords
-            
-            # Verifica se o arquivo já existe
-            if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
-                try:
-                    # Lê o CSV existente
-                    df = pd.read_csv(output_path)
-                    
-                    # Garante que todas as colunas existam
-                    for col in columns:
-                        if col not in df.columns:
-                            df[col] = ''
-                    
-                    # Adiciona nova linha
-                    df = pd.concat([df, pd.DataFrame([result])], ignore_index=True)
-                except Exception as e:
-                    # Se não conseguir ler o CSV existente, cria um novo
-                    if verbose:
-                        print(f"  ⚠️  Erro ao ler CSV existente, criando novo: {e}")
-                    df = pd.DataFrame([result], columns=columns)
-            else:
-                # Cria novo DataFrame com cabeçalho
-                df = pd.DataFrame([result], columns=columns)
-            
-            # Salva o arquivo
-            df.to_csv(output_path, index=False, encoding="utf-8")
+            new_file = os.stat(output_path).st_size == 0
+        except FileNotFoundError:
+            new_file = True
+        if not new_file:
+            fieldnames = self._prepare_existing(output_path, fieldnames, verbose)
+            new_file = os.path.getsize(output_path) == 0
+        
+        with open(output_path, 'a', newline='', encoding='utf-8', buffering=1) as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, restval='', extrasaction='ignore')
+            if new_file:
+                writer.writeheader()
+            try:
+                yield writer
+            finally:
+                f.flush()
+                os.fsync(f.fileno())
+    
+    def read_csv(self, source_file: str) -> "pd.DataFrame":
+        """
+        Lê um CSV de resultados com todas as colunas como texto
+        
+        Usa o leitor multithread do pyarrow quando disponível, com fallback
+        para o engine padrão do pandas.
+        
+        Args:
+            source_file: Caminho do arquivo CSV
             
-            if verbose:
-                print(f"  💾 Resultado salvo: {result.get('filename', 'N/A')}")
-                
-        except Exception as e:
-            print(f"❌ Erro ao salvar resultado: {e}")
+        Returns:
+            DataFrame com as células vazias como NaN
+        """
+        import pandas as pd
+        
+        # dtype=str evita a inferência de tipos por coluna; células vazias viram NaN
+        options = dict(dtype=str, keep_default_na=False, na_values=[''])
+        try:
+            return pd.read_csv(source_file, engine='pyarrow', **options)
+        except (ImportError, ValueError):
+            # pyarrow ausente ou arquivo que o leitor do arrow não aceita
+            return pd.read_csv(source_file, **options)
     
     def get_unique_filename(self, directory: str, base_filename: str) -> str:
         """
@@ -77,8 +142,20 @@ class CSVProcessor:
         new_filename = base_filename
         counter = 1
         
-        while os.path.isfile(os.path.join(directory, new_filename)):
+        # Um único scandir em vez de um isfile por candidato (só arquivos bloqueiam o nome)
+        try:
+            with os.scandir(directory or ".") as entries:
+                existing = {entry.name for entry in entries if entry.is_file()}
+        except FileNotFoundError:
+            existing = set()
+        except OSError:
+            while os.path.isfile(os.path.join(directory, new_filename)):
+                new_filename = f"{name} ({counter}){ext}"
+                counter += 1
+            return new_filename
+        
+        while new_filename in existing:
             new_filename = f"{name} ({counter}){ext}"
             counter += 1
         
-        return new_filename 
\ No newline at end of file
+        return new_filename
@@ -1,26 +1,91 @@
 import subprocess
 import requests
 import os
+import json
+import time
 from typing import List, Dict, Optional
 from dotenv import load_dotenv
 
+# Carrega o .env uma única vez na importação do módulo
+load_dotenv()
+
+# Lista de modelos do Ollama guardada em disco entre execuções (segundos de validade)
+MODELS_CACHE_TTL = 60
+MODELS_CACHE_PATH = os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "keywordpdf",
+    "ollama_models.json",
+)
+
 class LocalModelManager:
     """Gerencia modelos locais via Ollama"""
 
-    def __init__(self):
-        load_dotenv()
+    def __init__(self, session: Optional[requests.Session] = None):
         # Pode ser configurado via variável de ambiente
         self.base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
         print(f"Base URL: {self.base_url}")
         self._available_models = None
+        # Sessão reaproveita a conexão keep-alive entre as chamadas à API do Ollama;
+        # pode ser compartilhada com o conector (quem a criou é responsável por fechá-la)
+        self._owns_session = session is None
+        self._session = session if session is not None else requests.Session()
+
+    def close(self) -> None:
+        """Fecha a sessão HTTP, se tiver sido criada por este gerenciador"""
+        if self._owns_session:
+            self._session.close()
+
+    def __enter__(self) -> "LocalModelManager":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _read_models_cache(self) -> Optional[List[str]]:
+        """Lê a lista de modelos do cache em disco, se ainda válida para esta Base URL"""
+        try:
+            if time.time() - os.stat(MODELS_CACHE_PATH).st_mtime >= MODELS_CACHE_TTL:
+                return None
+            with open(MODELS_CACHE_PATH, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # JSON válido mas com outro formato também conta como ausência de cache
+        if not isinstance(cached, dict) or not isinstance(cached.get("models"), list):
+            return None
+        if cached.get("base_url") != self.base_url:
+            return None
+        return cached.get("models")
+
+    def _write_models_cache(self, models: List[str]) -> None:
+        """Grava a lista de modelos no cache em disco (falhas são ignoradas)"""
+        try:
+            os.makedirs(os.path.dirname(MODELS_CACHE_PATH), exist_ok=True)
+            tmp_path = f"{MODELS_CACHE_PATH}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"base_url": self.base_url, "models": models}, f)
+            os.replace(tmp_path, MODELS_CACHE_PATH)
+        except OSError:
+            pass
 
-    def list_models(self) -> List[str]:
-        """Lista todos os modelos disponíveis localmente"""
+    def list_models(self, refresh: bool = False) -> List[str]:
+        """
+        Lista todos os modelos disponíveis localmente
+        
+        Args:
+            refresh: Se True, ignora o cache em disco e consulta o Ollama
+        """
+        if not refresh:
+            models = self._read_models_cache()
+            if models is not None:
+                self._available_models = models
+                return models
         try:
-            resp = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            resp = self._session.get(f"{self.base_url}/api/tags", timeout=5)
             data = resp.json()
             models = [m['name'] for m in data.get('models', [])]
             self._available_models = models
+            self._write_models_cache(models)
             return models
         except Exception as e:
             print(f"Erro ao listar modelos: {e}")
@@ -30,7 +95,10 @@ class LocalModelManager:
         """Verifica se um modelo específico existe localmente"""
         if self._available_models is None:
             self.list_models()
-        return model in (self._available_models or [])
+        if model in (self._available_models or []):
+            return True
+        # Lista em cache pode ser anterior a um "ollama pull" feito fora da ferramenta
+        return model in self.list_models(refresh=True)
 
     def pull_model(self, model: str) -> bool:
         """Baixa um modelo do Ollama Hub"""
@@ -43,8 +111,12 @@ class LocalModelManager:
                 text=True
             )
             print(f"Modelo {model} baixado com sucesso!")
-            # Atualiza a lista de modelos disponíveis
+            # Atualiza a lista de modelos disponíveis (inclusive a gravada em disco)
             self._available_models = None
+            try:
+                os.remove(MODELS_CACHE_PATH)
+            except OSError:
+                pass
             return True
         except subprocess.CalledProcessError as e:
             print(f"Erro ao baixar modelo {model}: {e}")
@@ -56,18 +128,40 @@ class LocalModelManager:
     def get_model_info(self, model: str) -> Optional[Dict]:
         """Obtém informações sobre um modelo específico"""
         try:
-            resp = requests.get(f"{self.base_url}/api/show", json={"name": model}, timeout=5)
+            resp = self._session.get(f"{self.base_url}/api/show", json={"name": model}, timeout=5)
             return resp.json()
         except Exception:
             return None
 
-    def is_ollama_running(self) -> bool:
-        """Verifica se o Ollama está rodando"""
+    def is_ollama_running(self, refresh: bool = False) -> bool:
+        """
+        Verifica se o Ollama está rodando
+        
+        Uma lista de modelos recente em cache para esta Base URL vale como resposta;
+        senão, a própria consulta a /api/tags também preenche a lista de modelos.
+        
+        Args:
+            refresh: Se True, ignora o cache em disco e consulta o Ollama
+        """
+        if not refresh:
+            models = self._read_models_cache()
+            if models is not None:
+                self._available_models = models
+                return True
         try:
-            resp = requests.get(f"{self.base_url}/api/tags", timeout=2)
-            return resp.status_code == 200
+            resp = self._session.get(f"{self.base_url}/api/tags", timeout=2)
         except Exception:
             return False
+        if resp.status_code != 200:
+            return False
+        try:
+            models = [m['name'] for m in resp.json().get('models', [])]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            # Serviço respondeu, mas a lista não pôde ser lida: list_models tentará de novo
+            return True
+        self._available_models = models
+        self._write_models_cache(models)
+        return True
 
     def get_supported_models(self) -> List[str]:
         """Retorna lista de modelos suportados pelo sistema"""
@@ -89,21 +89,24 @@ else:
 # ---------------------------------------------------------------------------
 # Helper: Map symbols / keywords found in legacy "print" messages to severity
 # ---------------------------------------------------------------------------
-ERROR_TOKENS = {"❌", "erro", "error", "fatal"}
-WARNING_TOKENS = {"⚠️", "warn", "aviso"}
-DEBUG_TOKENS = {"🐞", "debug"}
+# Emoji markers are matched as substrings; words only as whole words, so a
+# file name like "Ferrovia.pdf" or a word like "terror" stays at INFO
+ERROR_MARKERS = ("❌",)
+WARNING_MARKERS = ("⚠️",)
+DEBUG_MARKERS = ("🐞",)
 
-_token_regex = re.compile("[\wÀ-ÿ]+", flags=re.IGNORECASE)
+_ERROR_WORDS = re.compile(r"\b(?:erro|error|fatal)\b", flags=re.IGNORECASE)
+_WARNING_WORDS = re.compile(r"\b(?:warn|aviso)\b", flags=re.IGNORECASE)
+_DEBUG_WORDS = re.compile(r"\bdebug\b", flags=re.IGNORECASE)
 
 
 def _detect_level(message: str) -> int:
     """Best-effort mapping from free-text *message* to a logging level."""
-    tokens = set(token.lower() for token in _token_regex.findall(message))
-    if tokens & ERROR_TOKENS:
+    if any(marker in message for marker in ERROR_MARKERS) or _ERROR_WORDS.search(message):
         return logging.ERROR
-    if tokens & WARNING_TOKENS:
+    if any(marker in message for marker in WARNING_MARKERS) or _WARNING_WORDS.search(message):
         return logging.WARNING
-    if tokens & DEBUG_TOKENS:
+    if any(marker in message for marker in DEBUG_MARKERS) or _DEBUG_WORDS.search(message):
         return logging.DEBUG
     # Default
     return logging.INFO
@@ -131,5 +134,14 @@ def _print_to_log(*args: Any, **kwargs: Any) -> None:  # noqa: D401
 if getattr(builtins.print, "__name__", "") != _print_to_log.__name__:
     builtins.print = _print_to_log  # type: ignore[assignment]
 
+
+def set_verbose(verbose: bool) -> None:
+    """Show ``DEBUG`` records on the console when *verbose* is on (``INFO`` otherwise).
+
+    The file handlers keep their levels; only the console follows the flag.
+    """
+    console_handler.setLevel(logging.DEBUG if verbose else logging.INFO)
+
+
 # Expose *logger* so other modules can do ``from logger_manager import logger``
-__all__ = ["logger"]
+__all__ = ["logger", "set_verbose"]
@@ -3,8 +3,10 @@ Processador de PDF - Conversão para Markdown
 """
 
 import os
+import hashlib
 import tempfile
-from typing import List, Optional
+import importlib.util
+from typing import Callable, Dict, List, Optional, Tuple
 
 from docling.datamodel.accelerator_options import AcceleratorDevice, AcceleratorOptions
 from docling.datamodel.base_models import InputFormat
@@ -14,56 +16,268 @@ from docling.datamodel.pipeline_options import (
 from docling.datamodel.settings import settings
 from docling.document_converter import DocumentConverter, PdfFormatOption
 
+HASH_BUFFER_SIZE = 1 << 20  # Leitura em blocos de 1 MiB para o hash do PDF
+
+# Backend 'text': PyMuPDF quando instalado (mais rápido), senão pypdfium2
+TEXT_BACKEND = "pymupdf" if importlib.util.find_spec("fitz") is not None else "pdfium"
+
+# Backend 'auto': páginas inspecionadas e limites usados na escolha por documento
+AUTO_PROBE_PAGES = 3          # Páginas iniciais verificadas em busca de camada de texto
+AUTO_MIN_TEXT_CHARS = 100     # Abaixo disso o PDF é tratado como digitalizado (OCR)
+AUTO_DOCLING_MAX_PAGES = 50   # PDFs com texto acima disso vão para o backend de texto
+
+# docling: OCR só é desligado quando a camada de texto cobre o documento
+OCR_MIN_TEXT_CHARS = 200      # Mínimo de caracteres no documento inteiro
+OCR_MAX_EMPTY_PAGES = 0.1     # Fração máxima de páginas sem texto (ex.: anexos digitalizados)
+
+# Threads do docling (torch) por processo; divididas entre os workers na conversão paralela
+DOCLING_NUM_THREADS = 8
+
+# Pré-filtro: caracteres do fim de uma página repetidos no teste da página seguinte
+PREFILTER_OVERLAP_CHARS = 200
+
+
 class PDFProcessor:
     """Processador de arquivos PDF - Conversão para Markdown"""
     
-    def __init__(self):
-        pass
+    def __init__(self, num_threads: int = DOCLING_NUM_THREADS):
+        # Threads usadas pelo docling em cada conversão
+        self._num_threads = num_threads
+        # Backend escolhido por documento no modo 'auto' (caminho -> backend)
+        self._auto_backends = {}
+        # Conversores docling já montados, por configuração de OCR (carregam modelos uma vez)
+        self._converters: Dict[bool, DocumentConverter] = {}
 
+    @staticmethod
+    def _file_digest(pdf_file: str) -> str:
+        """Calcula o SHA-256 do conteúdo do PDF"""
+        digest = hashlib.sha256()
+        with open(pdf_file, 'rb', buffering=HASH_BUFFER_SIZE) as f:
+            for block in iter(lambda: f.read(HASH_BUFFER_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest()
 
-    def _convert_file(self, pdf_file: str, verbose: bool = False) -> Optional[str]:
+
+    @staticmethod
+    def _probe_text_layer(pdf_file: str, max_pages: Optional[int] = None) -> Tuple[int, int, int]:
         """
-        Converte um PDF para Markdown
+        Mede a camada de texto do PDF com pypdfium2 (sem renderizar páginas)
+        
+        Args:
+            pdf_file: Caminho do PDF
+            max_pages: Número de páginas iniciais a inspecionar (None = todas)
+            
+        Returns:
+            Tupla (total de páginas, caracteres de texto, páginas inspecionadas sem texto)
         """
+        import pypdfium2 as pdfium
         
-        accelerator_options = AcceleratorOptions(
-            num_threads=8, 
-            device=AcceleratorDevice.AUTO
-        )
+        pdf = pdfium.PdfDocument(pdf_file)
+        try:
+            page_count = len(pdf)
+            text_chars = 0
+            empty_pages = 0
+            for index in range(page_count if max_pages is None else min(page_count, max_pages)):
+                page = pdf[index]
+                textpage = page.get_textpage()
+                chars = len(textpage.get_text_range().strip())
+                textpage.close()
+                page.close()
+                text_chars += chars
+                if not chars:
+                    empty_pages += 1
+        finally:
+            pdf.close()
+        return page_count, text_chars, empty_pages
 
-        pipeline_options = PdfPipelineOptions()
-        pipeline_options.do_ocr=True
-        pipeline_options.accelerator_options = accelerator_options
-        pipeline_options.do_table_structure = True
-        pipeline_options.table_structure_options.do_cell_matching = True
+    def _needs_ocr(self, pdf_file: str) -> bool:
+        """Indica se o PDF precisa de OCR (sem camada de texto suficiente)"""
+        try:
+            page_count, text_chars, empty_pages = self._probe_text_layer(pdf_file)
+        except Exception:
+            # Na dúvida (PDF que o pdfium não abre), mantém o OCR ligado
+            return True
+        return text_chars < OCR_MIN_TEXT_CHARS or empty_pages > OCR_MAX_EMPTY_PAGES * page_count
+
+    def _get_converter(self, do_ocr: bool) -> DocumentConverter:
+        """
+        Retorna o DocumentConverter para a configuração de OCR, criando-o no primeiro uso
         
+        Args:
+            do_ocr: Se o pipeline deve executar OCR
+            
+        Returns:
+            Conversor reaproveitado entre PDFs deste processo
+        """
+        converter = self._converters.get(do_ocr)
+        if converter is None:
+            accelerator_options = AcceleratorOptions(
+                num_threads=self._num_threads, 
+                device=AcceleratorDevice.AUTO
+            )
 
-        converter = DocumentConverter(
-            format_options={
-                InputFormat.PDF: PdfFormatOption(
-                    pipeline_options=pipeline_options,
-                )
-            }
-        )
-        # Enable the profiling to measure the time spent
-        settings.debug.profile_pipeline_timings = True
+            pipeline_options = PdfPipelineOptions()
+            pipeline_options.do_ocr = do_ocr
+            pipeline_options.accelerator_options = accelerator_options
+            pipeline_options.do_table_structure = True
+            pipeline_options.table_structure_options.do_cell_matching = True
+
+            converter = DocumentConverter(
+                format_options={
+                    InputFormat.PDF: PdfFormatOption(
+                        pipeline_options=pipeline_options,
+                    )
+                }
+            )
+            self._converters[do_ocr] = converter
+        return converter
+
+    def _convert_file(self, pdf_file: str, verbose: bool = False) -> Optional[str]:
+        """
+        Converte um PDF para Markdown
+        
+        O OCR só é executado quando o PDF não tem camada de texto suficiente.
+        """
+        do_ocr = self._needs_ocr(pdf_file)
+        if verbose and not do_ocr:
+            print(f"  📝 Camada de texto encontrada, OCR desativado: {os.path.basename(pdf_file)}")
+        
+        converter = self._get_converter(do_ocr)
+        # Profiling das etapas do pipeline só no modo verboso (instrumenta cada etapa)
+        settings.debug.profile_pipeline_timings = verbose
 
         # Convert the document
         conversion_result = converter.convert(pdf_file)
         doc = conversion_result.document
 
-        # List with total time per document
-        doc_conversion_secs = conversion_result.timings["pipeline_total"].times
+        if verbose:
+            # List with total time per document
+            doc_conversion_secs = conversion_result.timings["pipeline_total"].times
+            print(f"  ⏱️ Conversão de {os.path.basename(pdf_file)}: {sum(doc_conversion_secs):.1f}s")
 
-        md = doc.export_to_markdown()
-        # print(md)
-        # print(f"Conversion secs: {doc_conversion_secs}")
-        return md
+        return doc.export_to_markdown()
+
+    def _extract_text(self, pdf_file: str) -> Optional[str]:
+        """
+        Extrai a camada de texto do PDF com pypdfium2 (sem OCR nem tabelas)
+        """
+        import pypdfium2 as pdfium
+
+        pdf = pdfium.PdfDocument(pdf_file)
+        try:
+            parts = []
+            for page in pdf:
+                textpage = page.get_textpage()
+                text = textpage.get_text_range()
+                textpage.close()
+                page.close()
+                if text:
+                    parts.append(text)
+        finally:
+            pdf.close()
+
+        return "\n".join(parts)
+
+    def _extract_text_pymupdf(self, pdf_file: str) -> Optional[str]:
+        """
+        Extrai a camada de texto do PDF com PyMuPDF (opcional, licença AGPL)
+        """
+        import fitz
+
+        with fitz.open(pdf_file) as doc:
+            return "\n".join(page.get_text("text") for page in doc)
+
+    def _text_without_match(self, pdf_file: str, predicate: Callable[[str], bool]) -> Optional[str]:
+        """
+        Lê a camada de texto página a página e para no primeiro trecho aceito pelo predicado
+        
+        Cada página é testada junto com o final da página anterior com texto, unidos
+        por quebra de linha como no retorno, para não perder expressões quebradas entre páginas.
+        
+        Args:
+            pdf_file: Caminho do PDF
+            predicate: Função que indica se o texto contém o que se procura
+            
+        Returns:
+            O texto completo quando nenhuma página casa e a camada de texto dispensa OCR;
+            None quando houve casamento ou o texto não é confiável (é preciso converter)
+        """
+        import pypdfium2 as pdfium
+        
+        try:
+            pdf = pdfium.PdfDocument(pdf_file)
+        except Exception:
+            # PDF que o pdfium não abre segue para a conversão normal
+            return None
+        try:
+            page_count = len(pdf)
+            parts = []
+            text_chars = 0
+            empty_pages = 0
+            tail = ""
+            for page in pdf:
+                textpage = page.get_textpage()
+                text = textpage.get_text_range()
+                textpage.close()
+                page.close()
+                chars = len(text.strip())
+                # Mesmo separador do texto retornado: o predicado vê o que o analisador verá
+                if predicate(f"{tail}\n{text}" if tail else text):
+                    return None
+                text_chars += chars
+                if chars:
+                    parts.append(text)
+                    tail = text[-PREFILTER_OVERLAP_CHARS:]
+                else:
+                    empty_pages += 1
+        finally:
+            pdf.close()
+        
+        # Sem camada de texto suficiente a conversão com OCR pode encontrar o que falta
+        if text_chars < OCR_MIN_TEXT_CHARS or empty_pages > OCR_MAX_EMPTY_PAGES * page_count:
+            return None
+        return "\n".join(parts)
+
+    def _select_backend(self, pdf_file: str) -> str:
+        """
+        Escolhe o backend de um PDF no modo 'auto'
+        
+        Sem camada de texto (digitalizado) -> docling com OCR; com texto e muitas
+        páginas -> backend de texto; demais -> docling (Markdown com tabelas).
+        
+        Args:
+            pdf_file: Caminho do PDF
+            
+        Returns:
+            Nome do backend a utilizar
+        """
+        backend = self._auto_backends.get(pdf_file)
+        if backend is not None:
+            return backend
+        
+        try:
+            page_count, text_chars, _ = self._probe_text_layer(pdf_file, max_pages=AUTO_PROBE_PAGES)
+        except Exception:
+            # PDF que o pdfium não abre: o docling ainda pode convertê-lo (como em _needs_ocr)
+            page_count, text_chars = 0, 0
+        
+        if text_chars < AUTO_MIN_TEXT_CHARS:
+            backend = "docling"
+        elif page_count > AUTO_DOCLING_MAX_PAGES:
+            backend = TEXT_BACKEND
+        else:
+            backend = "docling"
+        
+        self._auto_backends[pdf_file] = backend
+        return backend
 
     def convert_single_pdf_to_markdown(
         self, 
         pdf_path: str, 
-        verbose: bool = False
+        verbose: bool = False,
+        backend: str = "docling",
+        cache_dir: Optional[str] = None,
+        prefilter: Optional[Callable[[str], bool]] = None
     ) -> Optional[str]:
         """
         Converte um único PDF para Markdown sob demanda
@@ -71,15 +285,69 @@ class PDFProcessor:
         Args:
             pdf_path: Caminho para o arquivo PDF
             verbose: Modo verboso
+            backend: 'docling' (Markdown com OCR e tabelas), 'pdfium' ou 'pymupdf'
+                (apenas texto, mais rápidos), 'text' (o mais rápido dos dois disponível)
+                ou 'auto' (escolhe por documento, ver _select_backend)
+            cache_dir: Diretório de cache; se informado, conversões anteriores do mesmo
+                conteúdo (SHA-256 do PDF) são reaproveitadas
+            prefilter: Predicado opcional (ex.: contém palavra-chave). Se nenhuma página da
+                camada de texto o satisfizer, o docling é dispensado e o texto é retornado
             
         Returns:
             Conteúdo Markdown como string, ou None se falhar
         """
         try:
-            return self._convert_file(pdf_path, verbose)
+            if backend == "text":
+                backend = TEXT_BACKEND
+            
+            digest = self._file_digest(pdf_path) if cache_dir else None
+            if digest:
+                # No modo 'auto' o cache é consultado antes da sondagem: um acerto em
+                # qualquer backend candidato (docling primeiro) dispensa abrir o PDF
+                candidates = ("docling", TEXT_BACKEND) if backend == "auto" else (backend,)
+                for candidate in candidates:
+                    # Abre direto (sem isfile antes): um acerto custa um único open
+                    try:
+                        with open(os.path.join(cache_dir, "markdown", candidate, f"{digest}.md"), 'r', encoding='utf-8') as f:
+                            return f.read()
+                    except FileNotFoundError:
+                        pass
+            
+            if backend == "auto":
+                backend = self._select_backend(pdf_path)
+                if verbose:
+                    print(f"  🔎 Backend escolhido para {os.path.basename(pdf_path)}: {backend}")
+            
+            cache_path = os.path.join(cache_dir, "markdown", backend, f"{digest}.md") if digest else None
+
+            if prefilter is not None and backend == "docling":
+                # Varredura da camada de texto com saída antecipada: sem casamento, o
+                # documento não precisa da conversão completa (o texto não vai para o cache)
+                content = self._text_without_match(pdf_path, prefilter)
+                if content is not None:
+                    if verbose:
+                        print(f"  ⏭️ Nenhuma palavra-chave na camada de texto, conversão dispensada: {os.path.basename(pdf_path)}")
+                    return content
 
-        except ImportError:
-            print("❌ Erro: docling não está instalado. Execute: pip install docling")
+            if backend == "pdfium":
+                content = self._extract_text(pdf_path)
+            elif backend == "pymupdf":
+                content = self._extract_text_pymupdf(pdf_path)
+            else:
+                content = self._convert_file(pdf_path, verbose)
+
+            if cache_path and content:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                # Grava em arquivo temporário e renomeia para não deixar cache parcial
+                tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                os.replace(tmp_path, cache_path)
+
+            return content
+
+        except ImportError as e:
+            print(f"❌ Erro: dependência não instalada ({e}). Execute: pip install -r requirements.txt")
             return None
         except Exception as e:
             # Captura erros internos (ex.: dependências como torch levantando AttributeError)
@@ -101,13 +369,26 @@ class PDFProcessor:
         if not os.path.exists(directory):
             return []
         
+        # os.scandir entrega DirEntry com nome, caminho e tipo já em cache,
+        # evitando um stat/os.path.join adicional por arquivo
         pdf_files = []
-        if recursive:
-            for root, _, files in os.walk(directory):
-                for file in files:
-                    if file.lower().endswith('.pdf'):
-                        pdf_files.append(os.path.join(root, file))
-        else:
-            pdf_files = [os.path.join(directory, f) for f in os.listdir(directory) if f.lower().endswith('.pdf')]
+        pending = [directory]
+        while pending:
+            current = pending.pop()
+            subdirs = []
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        # Compara só o sufixo, sem converter o nome inteiro para minúsculas
+                        if entry.name[-4:].lower() == '.pdf' and entry.is_file():
+                            pdf_files.append(entry.path)
+                        elif recursive and entry.is_dir(follow_symlinks=False):
+                            # Como no os.walk(followlinks=False): links para diretórios não são seguidos
+                            subdirs.append(entry.path)
+            except OSError:
+                # Diretório ilegível (ex.: sem permissão) é ignorado, como no os.walk
+                continue
+            # Mantém a ordem de visita top-down do os.walk
+            pending.extend(reversed(subdirs))
 
         return pdf_files